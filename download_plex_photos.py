@@ -10,25 +10,42 @@ General usage:
                                    --token "YOUR_PLEX_TOKEN" \
                                    --download_dir "./plex_photos" \
                                    --verbose \
-                                   --download_delay 1
+                                   --concurrency 8 \
+                                   --download_delay 1 \
+                                   --include_album "2022-01" --include_album "2022-02"
 
 This script connects to your Plex server, finds photo sections and album directories,
 and downloads each photo (skipping files that already exist locally). It provides
 simplified progress feedback.
 
-You can also supply a list of album/directory names in INCLUDE_ALBUMS to only
-download those specific top-level albums. Nested albums (sub-albums) inside
-an included top-level album will still be processed regardless of their title.
+A manifest of what has been downloaded is kept in <download_dir>/.manifest.sqlite, so
+later runs skip albums that have not changed on the server since the last run. Section
+and album listings are cached in <download_dir>/.plex_cache and revalidated with the
+server, so unchanged listings are not downloaded again. Use --full_scan to re-read every
+album anyway (e.g. after deleting files locally).
+
+You can also supply a list of album/directory names in INCLUDE_ALBUMS (or with
+--include_album, repeatable) to only download those specific top-level albums.
+Nested albums (sub-albums) inside an included top-level album will still be
+processed regardless of their title, unless --no_recursive is given. With
+--top_level_only, only photos directly in a section are downloaded, no albums.
 """
 
 import os
-import re
+import hashlib
+import shutil
+import sqlite3
 import time
+import queue
+import threading
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import xml.etree.ElementTree as ET
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Disable SSL warnings for self-signed certificates.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -46,177 +63,803 @@ INCLUDE_ALBUMS = [
     # Example: "2022-01", "2022-02", ...
 ]
 
+# Set to False (or pass --no_recursive) to skip nested sub-albums of the top-level albums.
+RECURSIVE = True
+
+# Set to True (or pass --top_level_only) to download only photos directly in a section.
+TOP_LEVEL_ONLY = False
+
+# Number of threads fetching album metadata in parallel during the crawl (main sets it to --concurrency).
+CRAWL_WORKERS = 8
+
+# Buffer size used when copying a photo response to disk.
+COPY_BUFSIZE = 1024 * 1024
+
+# Responses smaller than this (by Content-Length) are read in one piece instead of streamed.
+STREAM_THRESHOLD = 2 * 1024 * 1024
+
+# (connect, read) timeout in seconds for every request, so a stalled connection fails
+# (and frees its pool slot) instead of blocking its worker forever.
+REQUEST_TIMEOUT = (10, 60)
+
+# Name of the cross-run manifest database, created inside the download directory.
+MANIFEST_NAME = ".manifest.sqlite"
+
+# Directory (inside the download directory) holding cached section/album listing XML.
+CACHE_DIR_NAME = ".plex_cache"
+
+# Suffix of the temporary file a photo is written to until its download completes.
+PART_SUFFIX = ".part"
+
+# Query strings appended to photo part and album keys. The token is sent as a header,
+# so URLs stay short and identical across runs (they also key the listing cache).
+_DL_Q = "?download=1"
+_CHILDREN_Q = "?includeChildren=1"
+
+# Translation table mapping each disallowed filename character to an underscore.
+_SANITIZE = str.maketrans({c: "_" for c in '\\/*?:"<>|'})
+
 def sanitize_filename(name: str) -> str:
     """Replace disallowed filename characters with underscores."""
-    return re.sub(r'[\\/*?:"<>|]', "_", name)
+    return name.translate(_SANITIZE)
+
+# Directories already created (or known to exist) during this run.
+_MADE_DIRS = set()
 
-def build_download_url(base_url: str, part_key: str, token: str) -> str:
+# Set on Ctrl-C: the crawl and download workers stop taking new work once it is set.
+_STOP = threading.Event()
+
+def put_unless_stopped(q: queue.Queue, item) -> bool:
+    """q.put(item), but give up (returning False) once the run is being stopped."""
+    while not _STOP.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def ensure_dir(path: str):
+    """os.makedirs(path, exist_ok=True), skipped for directories already ensured in this run."""
+    if path not in _MADE_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _MADE_DIRS.add(path)
+
+def existing_filenames(directory: str) -> set:
+    """
+    Return the names of the entries already in a local directory, read with a single
+    os.scandir call (one directory read instead of one stat per photo).
+    """
+    if not os.path.isdir(directory):
+        return set()
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
+
+def build_download_url(base_url: str, part_key: str) -> str:
     """Construct the download URL for a photo part."""
-    return f"{base_url}{part_key}?download=1&X-Plex-Token={token}"
+    return base_url + part_key + _DL_Q
+
+def check_response(response: requests.Response):
+    """
+    raise_for_status() for a streamed response. A failed response is closed first so its
+    connection goes back to the (blocking) pool instead of being held until garbage collection.
+    """
+    if not response.ok:
+        response.close()
+    response.raise_for_status()
+
+def iter_xml_elements(source):
+    """
+    Incrementally parse XML from a binary file-like source (see fetch_listing), yielding
+    (depth, element) as soon as each element is complete (depth 1 = direct children of
+    the root). Each direct child of the root is detached from it once the caller is done
+    with it, whether or not it was handled, so memory stays bounded by a single element
+    instead of the whole listing. Callers should still clear() the elements they handle.
+    """
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+        else:
+            depth -= 1
+            yield depth, elem
+            if depth == 1:
+                # Drop the finished child (and any unhandled siblings before it) from the root.
+                del root[:]
+
+def is_photo_element(elem: ET.Element) -> bool:
+    """True for the <Photo> (or <Metadata type="photo">) elements of a Plex listing."""
+    return elem.tag == "Photo" or (elem.tag == "Metadata" and elem.get("type") == "photo")
+
+def create_session(token: str, max_connections: int = 32) -> requests.Session:
+    """
+    Create the HTTP session shared by every request, so the connection to the Plex
+    server (and its TLS handshake) is reused instead of reopened for each call.
+    The token is sent as a header, so it no longer needs to be in the query string.
+
+    At most max_connections requests are open to the server at once (threads beyond
+    that wait for a free connection). Responses with 429 or 5xx status and connection
+    errors are retried with exponential backoff (0.5s, 1s, 2s, ..., plus up to 0.5s of
+    random jitter on urllib3 2.x so parallel workers do not retry in lockstep), waiting
+    for the server's Retry-After header instead whenever it sends one.
+    """
+    session = requests.Session()
+    session.headers.update({'X-Plex-Token': token})
+    session.verify = False
+    retry_args = dict(total=5, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      respect_retry_after_header=True)
+    try:
+        retry = Retry(backoff_jitter=0.5, **retry_args)
+    except TypeError:
+        # urllib3 1.x has no backoff_jitter; retry without it.
+        retry = Retry(**retry_args)
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max_connections,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class CachingReader:
+    """
+    File-like wrapper around a streamed listing response that copies every byte read into
+    a cache file. The cache file is kept (and on_complete called) only if the response was
+    read to the end; otherwise it is discarded on close().
+    """
+
+    def __init__(self, response: requests.Response, path: str, on_complete):
+        self._response = response
+        self._path = path
+        self._tmp_path = path + PART_SUFFIX
+        self._file = open(self._tmp_path, 'wb')
+        self._on_complete = on_complete
+        self._complete = False
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._response.raw.read(size)
+        if data:
+            self._file.write(data)
+        else:
+            self._complete = True
+        return data
+
+    def close(self):
+        self._response.close()
+        self._file.close()
+        if self._complete:
+            os.replace(self._tmp_path, self._path)
+            self._on_complete()
+        else:
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Manifest:
+    """
+    SQLite record of previous runs. It stores every photo downloaded (or found on disk)
+    and, per album, the Plex updatedAt value, photos listed and sub-albums seen last time.
+    Incremental runs use it to skip albums that have not changed. It also caches the XML
+    of section/album listings in cache_dir, with their HTTP validators (ETag/Last-Modified),
+    so an unchanged listing can be revalidated with a 304 instead of downloaded again.
+    All methods are safe to call from multiple threads.
+
+    With enabled=False nothing is reported as unchanged (a full scan), but rows and
+    listings are still recorded for the next run.
+    """
+
+    def __init__(self, path: str, cache_dir: str, enabled: bool = True):
+        self.enabled = enabled
+        self.cache_dir = cache_dir
+        ensure_dir(cache_dir)
+        self._lock = threading.Lock()
+        # The default rollback journal is kept (not WAL), since WAL needs shared memory that
+        # network filesystems such as a NAS share do not provide.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS photos (
+                rating_key TEXT PRIMARY KEY,
+                local_path TEXT,
+                etag TEXT,
+                updated_at TEXT,
+                album_url TEXT
+            );
+            CREATE TABLE IF NOT EXISTS albums (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                local_dir TEXT,
+                parent_url TEXT,
+                updated_at TEXT,
+                photo_count INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS album_photos (
+                album_url TEXT,
+                rating_key TEXT,
+                PRIMARY KEY (album_url, rating_key)
+            );
+            CREATE TABLE IF NOT EXISTS partials (
+                local_path TEXT PRIMARY KEY,
+                validator TEXT
+            );
+            CREATE TABLE IF NOT EXISTS listings (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT
+            );
+            CREATE INDEX IF NOT EXISTS photos_album ON photos (album_url);
+            CREATE INDEX IF NOT EXISTS albums_parent ON albums (parent_url);
+        """)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _is_complete(self, url: str):
+        """Return the album row if every photo it listed last time is recorded, else None."""
+        row = self._db.execute(
+            "SELECT updated_at, photo_count FROM albums WHERE url = ?", (url,)).fetchone()
+        if row is None or row[1] is None:
+            return None
+        # Match the photos by the keys from the listing, not by count: rows of photos the
+        # server no longer lists must not stand in for ones that are missing.
+        listed, done = self._db.execute(
+            "SELECT COUNT(a.rating_key), COUNT(p.rating_key) FROM album_photos a "
+            "LEFT JOIN photos p ON p.rating_key = a.rating_key WHERE a.album_url = ?",
+            (url,)).fetchone()
+        return row if listed == row[1] and done == listed else None
+
+    def album_is_current(self, url: str, updated_at: str) -> bool:
+        """True if the album's updatedAt matches the last run and all its photos were downloaded."""
+        if not self.enabled or not updated_at:
+            return False
+        with self._lock:
+            row = self._is_complete(url)
+        return row is not None and row[0] == updated_at
+
+    def album_is_complete(self, url: str) -> bool:
+        """True if all photos the album had on the last run were downloaded."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            return self._is_complete(url) is not None
+
+    def _listing_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".xml")
+
+    def conditional_headers(self, url: str) -> dict:
+        """If-None-Match/If-Modified-Since headers for revalidating a cached listing."""
+        if not self.enabled or not os.path.exists(self._listing_path(url)):
+            return {}
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified FROM listings WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def open_cached_listing(self, url: str):
+        """Open the cached XML of a listing (after the server answered 304 Not Modified)."""
+        return open(self._listing_path(url), 'rb')
+
+    def cache_listing(self, url: str, response: requests.Response) -> CachingReader:
+        """Wrap a listing response so it is cached, with its validators, as it is read."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        def store_validators():
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO listings (url, etag, last_modified) VALUES (?, ?, ?)",
+                    (url, etag, last_modified))
+
+        return CachingReader(response, self._listing_path(url), store_validators)
+
+    def sub_albums(self, url: str) -> list:
+        """
+        The sub-albums recorded for an album, as (title, url, local_dir, updated_at) tuples.
+        updated_at is None because it is only known from a fresh parent listing, so each
+        sub-album is still revalidated with a conditional request.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT title, url, local_dir FROM albums WHERE parent_url = ?", (url,)).fetchall()
+        return [(title, sub_url, local_dir, None) for title, sub_url, local_dir in rows]
+
+    def record_album(self,
+                     url: str,
+                     title: str,
+                     local_dir: str,
+                     updated_at: str,
+                     photo_keys: set,
+                     sub_albums: list):
+        """
+        Store the state of an album listing that was just read: the rating keys of its
+        photos and its sub-albums. Photos recorded for the album that are no longer
+        listed are forgotten.
+        """
+        photo_count = len(photo_keys)
+        with self._lock, self._db:
+            self._db.execute("""
+                INSERT INTO albums (url, title, local_dir, updated_at, photo_count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    title = excluded.title,
+                    local_dir = excluded.local_dir,
+                    updated_at = COALESCE(excluded.updated_at, albums.updated_at),
+                    photo_count = excluded.photo_count
+            """, (url, title, local_dir, updated_at, photo_count))
+            self._db.execute("DELETE FROM album_photos WHERE album_url = ?", (url,))
+            self._db.executemany("INSERT INTO album_photos (album_url, rating_key) VALUES (?, ?)",
+                                 [(url, key) for key in photo_keys])
+            self._db.execute(
+                "DELETE FROM photos WHERE album_url = ? AND rating_key NOT IN "
+                "(SELECT rating_key FROM album_photos WHERE album_url = ?)", (url, url))
+            self._db.execute("UPDATE albums SET parent_url = NULL WHERE parent_url = ?", (url,))
+            self._db.executemany("""
+                INSERT INTO albums (url, title, local_dir, parent_url) VALUES (?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    title = excluded.title,
+                    local_dir = excluded.local_dir,
+                    parent_url = excluded.parent_url
+            """, [(sub_url, sub_title, sub_dir, url) for sub_title, sub_url, sub_dir, _ in sub_albums])
+
+    def partial_validator(self, local_path: str):
+        """The If-Range validator of the photo whose .part file is at local_path, if known."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT validator FROM partials WHERE local_path = ?", (local_path,)).fetchone()
+        return row[0] if row else None
+
+    def record_partial(self, local_path: str, validator: str = None):
+        """Remember the validator of a photo download starting at local_path (None forgets it)."""
+        with self._lock, self._db:
+            if validator:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO partials (local_path, validator) VALUES (?, ?)",
+                    (local_path, validator))
+            else:
+                self._db.execute("DELETE FROM partials WHERE local_path = ?", (local_path,))
+
+    def record_photo(self, task: dict, etag: str = None):
+        """Mark a photo task as present locally."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM partials WHERE local_path = ?", (task["local_path"],))
+            self._db.execute(
+                "INSERT OR REPLACE INTO photos (rating_key, local_path, etag, updated_at, album_url) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (task["rating_key"], task["local_path"], etag, task["updated_at"], task["album_url"]))
+
+def resume_validator(response: requests.Response):
+    """
+    The validator to send as If-Range when resuming this photo later: its ETag if strong
+    (If-Range does not accept weak ones), else its Last-Modified date, else None.
+    """
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+def fetch_listing(session: requests.Session, url: str, manifest: Manifest) -> tuple:
+    """
+    Request a section/album XML listing, revalidating the copy cached by an earlier run.
+    Returns a tuple (source, not_modified). source is a binary file-like object to parse
+    and close: the live response (cached while it is read) or, when the server answered
+    304 Not Modified, the cached copy.
+    """
+    r = session.get(url, stream=True, headers=manifest.conditional_headers(url),
+                    timeout=REQUEST_TIMEOUT)
+    if r.status_code == 304:
+        r.close()
+        return manifest.open_cached_listing(url), True
+    check_response(r)
+    r.raw.decode_content = True
+    try:
+        return manifest.cache_listing(url, r), False
+    except Exception:
+        # Release the connection if the cache file cannot be created.
+        r.close()
+        raise
+
+def build_photo_task(photo: ET.Element,
+                     album_title: str,
+                     album_dir: str,
+                     album_url: str,
+                     base_url: str) -> dict:
+    """
+    Build the download task for a parsed <Photo> element (see gather_album_photos for the
+    keys), or return None if it has no rating key or downloadable part. The element is cleared afterwards
+    to release its children.
+    """
+    ratingKey = photo.get('ratingKey') or photo.get('id')
+    photo_title = photo.get('title') or ratingKey
+    photo_updated_at = photo.get('updatedAt')
+    part = next(photo.iter('Part'), None)
+    photo.clear()
+    if part is None or not ratingKey:
+        return None
+    part_key = part.get('key')
+    if not part_key:
+        return None
+    container = part.get('container', 'jpg')
+
+    safe_title = sanitize_filename(photo_title)
+    filename = f"{ratingKey}_{safe_title}.{container}"
+    return {
+        "album_title": album_title,
+        "filename": filename,
+        "local_path": os.path.join(album_dir, filename),
+        "download_url": build_download_url(base_url, part_key),
+        "rating_key": ratingKey,
+        "updated_at": photo_updated_at,
+        "album_url": album_url,
+    }
+
+def queue_photo_task(task: dict, existing: set, task_queue: queue.Queue, manifest: Manifest):
+    """Put a photo task on task_queue, unless its file is already in the album directory."""
+    if task["filename"] in existing:
+        logging.info(f"SKIP (exists) {task['filename']}")
+        manifest.record_photo(task)
+        return
+    logging.info(f"QUEUED {task['filename']}")
+    put_unless_stopped(task_queue, task)
 
 def gather_album_photos(album_title: str,
                         album_url: str,
                         album_dir: str,
+                        updated_at: str,
                         base_url: str,
-                        token: str) -> list:
+                        session: requests.Session,
+                        task_queue: queue.Queue,
+                        manifest: Manifest) -> list:
     """
-    Recursively gather all photos from a given album (and any sub-albums).
-    Returns a list of dicts, each representing a single photo to be downloaded:
-      [
+    Gather the photos directly inside a given album (sub-albums are returned, not visited).
+    Each photo to be downloaded is put on task_queue as soon as it is parsed, as a dict:
         {
           "album_title": str,
           "local_path": str,        # Full path to local file
           "filename": str,          # The filename alone
           "download_url": str,      # URL from which to download
-        },
-        ...
-      ]
+          "rating_key": str,        # Plex ratingKey of the photo
+          "updated_at": str,        # Plex updatedAt of the photo
+          "album_url": str,         # Listing URL of the album containing the photo
+        }
+    Returns a list of (title, url, local_dir, updated_at) tuples, one per nested sub-album.
+
+    updated_at is the album's updatedAt from its parent listing (None if unknown). If it
+    matches the manifest and the album was completely downloaded before, the album listing
+    is not requested at all; otherwise it is revalidated against the cached listing, and a
+    304 Not Modified for a complete album skips it as well. Skipped albums return their
+    sub-albums from the manifest.
     """
-    results = []
+    sub_albums = []
 
-    # Request album metadata
+    if manifest.album_is_current(album_url, updated_at):
+        logging.info(f"SKIP (unchanged) {album_title}")
+        return manifest.sub_albums(album_url)
+
+    # Request album metadata (streamed, so photos are queued while the XML is still arriving)
     try:
-        r = requests.get(album_url, headers={'X-Plex-Token': token}, verify=False)
-        r.raise_for_status()
+        source, not_modified = fetch_listing(session, album_url, manifest)
+        if not_modified and manifest.album_is_complete(album_url):
+            source.close()
+            logging.info(f"SKIP (not modified) {album_title}")
+            return manifest.sub_albums(album_url)
     except Exception as e:
         logging.info(f"ERROR: cannot access album '{album_title}' -> {e}")
-        return results
+        return sub_albums
 
-    # Parse XML
+    photo_keys = set()
     try:
-        root = ET.fromstring(r.content)
-    except ET.ParseError as e:
-        logging.info(f"ERROR: XML parse in album '{album_title}' -> {e}")
-        return results
-
-    # --- Gather photos in the current album ---
-    photos = root.findall('./Photo')
-    if not photos:
-        photos = root.findall('./Metadata[@type="photo"]')
-    for photo in photos:
-        ratingKey = photo.get('ratingKey') or photo.get('id')
-        photo_title = photo.get('title') or ratingKey
-        part = photo.find('.//Part')
-        if part is None:
-            continue
-        part_key = part.get('key')
-        if not part_key:
-            continue
-        container = part.get('container', 'jpg')
-
-        safe_title = sanitize_filename(photo_title)
-        filename = f"{ratingKey}_{safe_title}.{container}"
-        local_path = os.path.join(album_dir, filename)
-
-        if os.path.exists(local_path):
-            logging.info(f"SKIP (exists) {os.path.relpath(local_path, album_dir)}")
-            continue
-
-        download_url = build_download_url(base_url, part_key, token)
-        logging.info(f"QUEUED {os.path.relpath(local_path, album_dir)}")
-        results.append({
-            "album_title": album_title,
-            "filename": filename,
-            "local_path": local_path,
-            "download_url": download_url,
-        })
-
-    # --- Recursively gather any nested sub-albums ---
-    sub_albums = root.findall('./Directory')
-    for sub in sub_albums:
-        sub_title = sub.get("title", "untitled")
-        sub_key = sub.get("key")
-        sub_dir = os.path.join(album_dir, sanitize_filename(sub_title))
-        os.makedirs(sub_dir, exist_ok=True)
-        sub_url = f"{base_url}{sub_key}?includeChildren=1&X-Plex-Token={token}"
-        results.extend(gather_album_photos(sub_title, sub_url, sub_dir, base_url, token))
-
-    return results
+        with source:
+            # Created here rather than when the album is discovered, so albums that are never
+            # visited (e.g. with --no_recursive) do not leave empty directories behind.
+            ensure_dir(album_dir)
+            existing = existing_filenames(album_dir)
+            for depth, elem in iter_xml_elements(source):
+                if depth != 1:
+                    continue
+
+                # --- Gather photos in the current album ---
+                if is_photo_element(elem):
+                    task = build_photo_task(elem, album_title, album_dir, album_url, base_url)
+                    if task is not None:
+                        photo_keys.add(task["rating_key"])
+                        queue_photo_task(task, existing, task_queue, manifest)
+
+                # --- Collect any nested sub-albums for the caller to visit ---
+                elif elem.tag == 'Directory':
+                    sub_title = elem.get("title", "untitled")
+                    sub_key = elem.get("key")
+                    sub_updated_at = elem.get("updatedAt")
+                    elem.clear()
+                    if not sub_key:
+                        continue
+                    sub_dir = os.path.join(album_dir, sanitize_filename(sub_title))
+                    sub_url = base_url + sub_key + _CHILDREN_Q
+                    sub_albums.append((sub_title, sub_url, sub_dir, sub_updated_at))
+    except (ET.ParseError, requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        logging.info(f"ERROR: reading album '{album_title}' -> {e}")
+        return sub_albums
+
+    manifest.record_album(album_url, album_title, album_dir, updated_at, photo_keys, sub_albums)
+    return sub_albums
+
+def crawl_albums(albums: list,
+                 base_url: str,
+                 session: requests.Session,
+                 task_queue: queue.Queue,
+                 manifest: Manifest,
+                 workers: int = None):
+    """
+    Gather all photos from the given albums and all of their nested sub-albums onto task_queue.
+    Each album is a (title, url, local_dir, updated_at) tuple. Albums are taken breadth-first from
+    a shared queue by `workers` threads (CRAWL_WORKERS by default), so album metadata requests overlap instead of
+    being issued one after another. Sub-albums are only visited if RECURSIVE is set.
+    """
+    workers = workers or CRAWL_WORKERS
+    album_queue = queue.Queue()
+    for album in albums:
+        album_queue.put(album)
+
+    def worker():
+        while True:
+            album = album_queue.get()
+            if album is None:
+                return
+            try:
+                if _STOP.is_set():
+                    continue
+                try:
+                    sub_albums = gather_album_photos(*album, base_url, session, task_queue,
+                                                     manifest)
+                except Exception as e:
+                    # Keep the worker alive: if every worker died, join() would wait forever.
+                    logging.info(f"ERROR: crawling album '{album[0]}' -> {e}")
+                    continue
+                # Enqueue sub-albums before marking this album done so join() keeps waiting.
+                if RECURSIVE:
+                    for sub_album in sub_albums:
+                        album_queue.put(sub_album)
+            finally:
+                album_queue.task_done()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    album_queue.join()
+    for _ in threads:
+        album_queue.put(None)
+    for t in threads:
+        t.join()
 
 def gather_section_photos(section_title: str,
-                          section_root: ET.Element,
+                          section_url: str,
                           section_dir: str,
                           base_url: str,
-                          token: str) -> list:
+                          session: requests.Session,
+                          task_queue: queue.Queue,
+                          manifest: Manifest):
     """
-    Gather top-level photos and top-level album directories (recursively),
-    respecting INCLUDE_ALBUMS filtering only for top-level albums.
+    Gather top-level photos and top-level album directories (recursively) onto task_queue,
+    respecting INCLUDE_ALBUMS filtering only for top-level albums. Albums are skipped
+    entirely if TOP_LEVEL_ONLY is set. section_url is the
+    section's /all listing, which is parsed as it arrives (or from the cache if unchanged).
     """
-    tasks = []
-
-    # Gather top-level photos (if any)
-    top_photos = section_root.findall('.//Photo')
-    if not top_photos:
-        top_photos = section_root.findall('.//Metadata[@type="photo"]')
-    for photo in top_photos:
-        ratingKey = photo.get('ratingKey') or photo.get('id')
-        photo_title = photo.get('title') or ratingKey
-        part = photo.find('.//Part')
-        if part is None:
-            continue
-        part_key = part.get('key')
-        if not part_key:
-            continue
-        container = part.get('container', 'jpg')
-
-        safe_title = sanitize_filename(photo_title)
-        filename = f"{ratingKey}_{safe_title}.{container}"
-        local_path = os.path.join(section_dir, filename)
-        if os.path.exists(local_path):
-            logging.info(f"SKIP (exists) {os.path.relpath(local_path, section_dir)}")
-            continue
-
-        download_url = build_download_url(base_url, part_key, token)
-        logging.info(f"QUEUED {os.path.relpath(local_path, section_dir)}")
-        tasks.append({
-            "album_title": section_title,  # top-level photo in the section
-            "filename": filename,
-            "local_path": local_path,
-            "download_url": download_url,
-        })
-
-    # Gather top-level album directories
-    album_dirs = section_root.findall(".//Directory")
-    for album in album_dirs:
-        album_key = album.get("key")
-        album_title = album.get("title", "untitled")
-
-        # Only filter top-level albums.
-        if INCLUDE_ALBUMS and album_title not in INCLUDE_ALBUMS:
-            logging.info(f"SKIP (album not in INCLUDE_ALBUMS) {album_title}")
-            continue
-
-        album_subdir = os.path.join(section_dir, sanitize_filename(album_title))
-        os.makedirs(album_subdir, exist_ok=True)
-        album_url = f"{base_url}{album_key}?includeChildren=1&X-Plex-Token={token}"
-        tasks.extend(gather_album_photos(album_title, album_url, album_subdir, base_url, token))
-    return tasks
+    try:
+        source, _ = fetch_listing(session, section_url, manifest)
+    except Exception as e:
+        logging.info(f"ERROR: retrieving items for section '{section_title}' -> {e}")
+        return
 
-def download_tasks(tasks: list, download_delay: float, download_dir: str):
+    albums = []
+    try:
+        with source:
+            existing = existing_filenames(section_dir)
+            for _, elem in iter_xml_elements(source):
+                # Gather top-level photos (if any)
+                if is_photo_element(elem):
+                    # album_title is the section title for a top-level photo in the section
+                    task = build_photo_task(elem, section_title, section_dir, section_url, base_url)
+                    if task is not None:
+                        queue_photo_task(task, existing, task_queue, manifest)
+
+                # Gather top-level album directories
+                elif elem.tag == "Directory":
+                    album_key = elem.get("key")
+                    album_title = elem.get("title", "untitled")
+                    album_updated_at = elem.get("updatedAt")
+                    elem.clear()
+                    if not album_key:
+                        continue
+
+                    if TOP_LEVEL_ONLY:
+                        logging.info(f"SKIP (top-level photos only) {album_title}")
+                        continue
+
+                    # Only filter top-level albums.
+                    if INCLUDE_ALBUMS and album_title not in INCLUDE_ALBUMS:
+                        logging.info(f"SKIP (album not in INCLUDE_ALBUMS) {album_title}")
+                        continue
+
+                    album_subdir = os.path.join(section_dir, sanitize_filename(album_title))
+                    album_url = base_url + album_key + _CHILDREN_Q
+                    albums.append((album_title, album_url, album_subdir, album_updated_at))
+    except (ET.ParseError, requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        logging.info(f"ERROR: reading items of section '{section_title}' -> {e}")
+
+    # Crawl the albums (and their sub-albums) in parallel
+    crawl_albums(albums, base_url, session, task_queue, manifest)
+
+def crawl_sections(photo_sections: list,
+                   download_dir: str,
+                   base_url: str,
+                   session: requests.Session,
+                   task_queue: queue.Queue,
+                   manifest: Manifest,
+                   download_workers: int):
+    """
+    Producer side of the pipeline: crawl every photo section and put its photos on
+    task_queue while the download workers are already consuming it. When the crawl
+    is finished (or fails), one None sentinel per download worker is queued so the
+    workers know to exit.
     """
-    Given a list of download tasks (each with album_title, filename, local_path, download_url),
-    download them one by one, showing progress logs that include the album/sub-album path starting
-    from the top-level album (i.e. skipping the base download directory).
+    try:
+        for section in photo_sections:
+            if _STOP.is_set():
+                break
+            section_key = section.get("key")
+            section_title = section.get("title", "untitled")
+            section_dir = os.path.join(download_dir, sanitize_filename(section_title))
+            try:
+                ensure_dir(section_dir)
+            except OSError as e:
+                logging.info(f"ERROR: cannot create folder for section '{section_title}' -> {e}")
+                continue
+
+            logging.info(f"\nSection: {section_title}")
+            all_url = f"{base_url}/library/sections/{section_key}/all"
+            try:
+                gather_section_photos(section_title, all_url, section_dir, base_url, session,
+                                      task_queue, manifest)
+            except Exception as e:
+                # One failing section must not end the crawl of the others.
+                logging.info(f"ERROR: crawling section '{section_title}' -> {e}")
+    finally:
+        for _ in range(download_workers):
+            put_unless_stopped(task_queue, None)
+
+def download_tasks(task_queue: queue.Queue,
+                   download_delay: float,
+                   download_dir: str,
+                   session: requests.Session,
+                   manifest: Manifest,
+                   concurrency: int = 8) -> tuple:
     """
-    total = len(tasks)
-    for i, task in enumerate(tasks, start=1):
+    Consumer side of the pipeline: take download tasks (each with album_title, filename,
+    local_path, download_url) from task_queue and download them on `concurrency` worker
+    threads sharing one session, until each worker receives a None sentinel. Each finished
+    download is recorded in the manifest. On Ctrl-C the workers finish their current photo,
+    stop taking new ones, and KeyboardInterrupt is re-raised. Progress logs include the album/sub-album path
+    starting from the top-level album (i.e. skipping the base download directory).
+    Returns a tuple (downloaded, attempted).
+    """
+    counter_lock = threading.Lock()
+    counts = {"attempted": 0, "downloaded": 0}
+
+    def download_one(task: dict) -> bool:
         # Remove the base download directory so the path starts with the album folder.
         rel_full = os.path.relpath(task["local_path"], download_dir)
         parts = os.path.normpath(rel_full).split(os.sep)
         display_path = os.path.join(*parts[1:]) if len(parts) > 1 else rel_full
-        logging.info(f"Downloading {i} of {total} - {display_path}")
+        with counter_lock:
+            counts["attempted"] += 1
+            i = counts["attempted"]
+        logging.info(f"Downloading {i} - {display_path}")
         try:
-            response = requests.get(task["download_url"], stream=True, verify=False)
-            response.raise_for_status()
-            with open(task["local_path"], 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Write to a .part file and rename it only once complete, so an interrupted download
+            # is never mistaken for a finished photo. A .part left by an earlier run is resumed,
+            # but only with the validator of the download that wrote it: If-Range makes the
+            # server resend the whole photo instead of the range if the photo changed since.
+            part_path = task["local_path"] + PART_SUFFIX
+            try:
+                offset = os.path.getsize(part_path)
+            except OSError:
+                offset = 0
+            validator = manifest.partial_validator(task["local_path"]) if offset else None
+            # Photos are already compressed, so ask for them as-is.
+            headers = {'Accept-Encoding': 'identity'}
+            if validator:
+                headers['Range'] = f"bytes={offset}-"
+                headers['If-Range'] = validator
+            else:
+                offset = 0
+            response = session.get(task["download_url"], stream=True, headers=headers,
+                                   timeout=REQUEST_TIMEOUT)
+            if offset and (response.status_code == 416 or (
+                    response.status_code == 206 and
+                    not response.headers.get('Content-Range', '').startswith(f"bytes {offset}-"))):
+                # The partial file does not match the photo any more; start over.
+                response.close()
+                del headers['Range'], headers['If-Range']
+                response = session.get(task["download_url"], stream=True, headers=headers,
+                                       timeout=REQUEST_TIMEOUT)
+            check_response(response)
+            with response:
+                # Append only if the server honoured the range; a plain 200 resends the whole photo.
+                if response.status_code != 206:
+                    offset = 0
+                    manifest.record_partial(task["local_path"], resume_validator(response))
+                mode = 'ab' if offset else 'wb'
+                size = int(response.headers.get('Content-Length') or STREAM_THRESHOLD)
+                if size < STREAM_THRESHOLD:
+                    # Typical photos fit in memory: read the body at once and write it in one call.
+                    # The file is only opened once the body has arrived, so a failed read
+                    # does not leave an empty .part behind.
+                    body = response.content
+                    with open(part_path, mode) as f:
+                        f.write(body)
+                else:
+                    # Copy the raw stream in large blocks (copyfileobj already batches, so the file is unbuffered).
+                    response.raw.decode_content = True
+                    with open(part_path, mode, buffering=0) as f:
+                        shutil.copyfileobj(response.raw, f, length=COPY_BUFSIZE)
+            os.replace(part_path, task["local_path"])
         except Exception as e:
             logging.info(f"ERROR downloading {display_path} -> {e}")
-        else:
-            if download_delay > 0:
-                time.sleep(download_delay)
+            return False
+        manifest.record_photo(task, response.headers.get("ETag"))
+        with counter_lock:
+            counts["downloaded"] += 1
+        return True
+
+    def worker():
+        while True:
+            task = task_queue.get()
+            try:
+                if task is None or _STOP.is_set():
+                    return
+                try:
+                    downloaded = download_one(task)
+                except Exception as e:
+                    # Keep the worker alive: if every worker died, the crawler would block
+                    # forever on the full task queue.
+                    logging.info(f"ERROR downloading {task['filename']} -> {e}")
+                    downloaded = False
+                # The delay is applied per worker, after each of its downloads.
+                if downloaded and download_delay > 0:
+                    time.sleep(download_delay)
+            finally:
+                task_queue.task_done()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        try:
+            # Surface anything that escaped a worker instead of dropping it with the future.
+            for future in as_completed(futures):
+                future.result()
+        except KeyboardInterrupt:
+            _STOP.set()
+            # Wake workers waiting on an empty queue; busy ones see _STOP before their next task.
+            for _ in futures:
+                try:
+                    task_queue.put_nowait(None)
+                except queue.Full:
+                    break
+            raise
+    return counts["downloaded"], counts["attempted"]
 
 def main():
     parser = argparse.ArgumentParser(description="Download all photos from a Plex photo section and its albums.")
@@ -225,9 +868,25 @@ def main():
     parser.add_argument("--download_dir", default="./plex_photos", help="Directory to save downloaded photos")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--download_delay", default=0, type=float,
-                        help="Delay between downloads in seconds (can be fractional)")
+                        help="Delay between downloads in seconds, per download worker (can be fractional)")
+    parser.add_argument("--concurrency", default=8, type=int,
+                        help="Number of photos to download (and albums to crawl) in parallel; "
+                             "at most twice this many connections are open to the server")
+    parser.add_argument("--full_scan", action="store_true",
+                        help="Re-read every album instead of skipping albums unchanged since the last run")
+    parser.add_argument("--include_album", action="append", default=[], metavar="NAME",
+                        help="Only download this top-level album (repeatable; adds to INCLUDE_ALBUMS)")
+    parser.add_argument("--no_recursive", action="store_true",
+                        help="Do not descend into sub-albums of the top-level albums")
+    parser.add_argument("--top_level_only", action="store_true",
+                        help="Only download photos directly in a section, not in albums")
     args = parser.parse_args()
 
+    global RECURSIVE, TOP_LEVEL_ONLY, CRAWL_WORKERS
+    INCLUDE_ALBUMS.extend(args.include_album)
+    RECURSIVE = RECURSIVE and not args.no_recursive
+    TOP_LEVEL_ONLY = TOP_LEVEL_ONLY or args.top_level_only
+
     logging.basicConfig(level=logging.INFO, format="%(message)s")
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -236,12 +895,18 @@ def main():
     token = args.token
     download_dir = args.download_dir
     download_delay = args.download_delay
-    os.makedirs(download_dir, exist_ok=True)
+    concurrency = max(1, args.concurrency)
+    CRAWL_WORKERS = concurrency
+    ensure_dir(download_dir)
+    # One connection per download worker and per crawl worker; this also caps the load on the server.
+    # Crawl workers hold their listing connection while waiting on a full task queue, so the
+    # downloads need connections of their own or the pipeline could deadlock.
+    session = create_session(token, max_connections=2 * concurrency)
 
     logging.info("Requesting library sections...")
-    sections_url = f"{base_url}/library/sections?X-Plex-Token={token}"
+    sections_url = f"{base_url}/library/sections"
     try:
-        sections_r = requests.get(sections_url, headers={'X-Plex-Token': token}, verify=False)
+        sections_r = session.get(sections_url, timeout=REQUEST_TIMEOUT)
         sections_r.raise_for_status()
     except Exception as e:
         logging.info(f"ERROR: retrieving library sections -> {e}")
@@ -254,43 +919,43 @@ def main():
         return
 
     # Find photo sections (where type is "photo").
-    photo_sections = [d for d in sections_root.findall("Directory") if d.get("type") == "photo"]
+    photo_sections = [d for d in sections_root if d.tag == "Directory" and d.get("type") == "photo"]
     if not photo_sections:
         logging.info("No photo sections found!")
         return
 
-    all_tasks = []
-    for section in photo_sections:
-        section_key = section.get("key")
-        section_title = section.get("title", "untitled")
-        section_dir = os.path.join(download_dir, sanitize_filename(section_title))
-        os.makedirs(section_dir, exist_ok=True)
-
-        logging.info(f"\nSection: {section_title}")
-        all_url = f"{base_url}/library/sections/{section_key}/all?X-Plex-Token={token}"
-        try:
-            items_r = requests.get(all_url, headers={'X-Plex-Token': token}, verify=False)
-            items_r.raise_for_status()
-        except Exception as e:
-            logging.info(f"ERROR: retrieving items for section '{section_title}' -> {e}")
-            continue
-
-        try:
-            items_root = ET.fromstring(items_r.content)
-        except ET.ParseError as e:
-            logging.info(f"ERROR: parsing items XML in section '{section_title}' -> {e}")
-            continue
-
-        section_tasks = gather_section_photos(section_title, items_root, section_dir, base_url, token)
-        all_tasks.extend(section_tasks)
+    try:
+        manifest = Manifest(os.path.join(download_dir, MANIFEST_NAME),
+                            os.path.join(download_dir, CACHE_DIR_NAME),
+                            enabled=not args.full_scan)
+    except (sqlite3.Error, OSError) as e:
+        logging.info(f"ERROR: opening manifest in '{download_dir}' -> {e}")
+        return
 
-    total_to_download = len(all_tasks)
-    if total_to_download == 0:
+    # Crawl in a background thread while the download workers consume its queue, so the
+    # first photos start downloading as soon as the first album's metadata arrives.
+    task_queue = queue.Queue(maxsize=256)
+    crawler = threading.Thread(target=crawl_sections,
+                               args=(photo_sections, download_dir, base_url, session,
+                                     task_queue, manifest, concurrency),
+                               daemon=True)
+    crawler.start()
+    try:
+        downloaded, attempted = download_tasks(task_queue, download_delay, download_dir, session,
+                                               manifest, concurrency)
+    except KeyboardInterrupt:
+        # The crawl threads are daemons and stop with the process; finished photos are
+        # already in the manifest and unfinished ones stay as .part files to resume.
+        logging.info("\nInterrupted, stopping.")
+        raise SystemExit(130)
+    crawler.join()
+    manifest.close()
+
+    if attempted == 0:
         logging.info("\nAll files already exist locally. Nothing to download.")
         return
 
-    logging.info(f"\nTotal files to download: {total_to_download}\n")
-    download_tasks(all_tasks, download_delay, download_dir)
+    logging.info(f"\nTotal files downloaded: {downloaded} of {attempted}")
 
 if __name__ == "__main__":
     main()